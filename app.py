@@ -1,14 +1,14 @@
 
 import os
+import re
+import glob
 import math
 import datetime as dt
 from dataclasses import dataclass
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-import requests
 import streamlit as st
 from zoneinfo import ZoneInfo
-from timezonefinder import TimezoneFinder
-import swisseph as swe
 from textwrap import dedent
 
 # ---------- Constants ----------
@@ -42,8 +42,7 @@ def fmt_age_year_month(age_years: float) -> str:
     """예: 8.33 -> '8년 4개월' (개월은 반올림하지 않고 내림으로 표시)"""
     if age_years is None:
         return ""
-    y = int(math.floor(age_years))
-    m = int(math.floor((age_years - y) * 12.0 + 1e-9))
+    y, m = divmod(int(age_years * 12.0 + 1e-9), 12)  # 나이는 항상 0 이상
     return f"{y}년 {m}개월"
 
 # ---------- Advanced (오행/십신/십이운성) ----------
@@ -52,7 +51,6 @@ STEM_ELEMENTS = [0, 0, 1, 1, 2, 2, 3, 3, 4, 4]  # 甲乙(목), 丙丁(화), 戊
 BRANCH_ELEMENTS = [4, 2, 0, 0, 2, 1, 1, 2, 3, 3, 2, 4]  # 子(수), 丑(토), 寅(목), 卯(목), 辰(토), 巳(화), 午(화), 未(토), 申(금), 酉(금), 戌(토), 亥(수)
 
 ELEM_NAMES = ["목", "화", "토", "금", "수"]
-ELEM_COLORS = ["#2266CC", "#DD4444", "#DDAA00", "#777777", "#222222"]
 
 # 십신 명칭 (관계 0~4: 비겁/식상/재성/관성/인성, [음양같음, 음양다름])
 SIPSIN_NAMES = {
@@ -66,58 +64,56 @@ SIPSIN_NAMES = {
 # 십이운성 순서 (절, 태, 양, 장생, 목욕, 관대, 건록, 제왕, 쇠, 병, 사, 묘)
 UNSEONG_ORDER = ["절","태","양","장생","목욕","관대","건록","제왕","쇠","병","사","묘"]
 
-def get_element_idx(char: str) -> int:
-    if char in STEMS:
-        return STEM_ELEMENTS[STEMS.index(char)]
-    if char in BRANCHES:
-        return BRANCH_ELEMENTS[BRANCHES.index(char)]
-    return 0
-
-def get_polarity(char: str) -> int:
-    """0: 양, 1: 음 (간지의 기본 홀짝 규칙)"""
-    if char in STEMS:
-        return STEMS.index(char) % 2
-    if char in BRANCHES:
-        return BRANCHES.index(char) % 2
-    return 0
-
-def get_sipsin(day_stem: str, target: str) -> str:
-    """일간(day_stem) 기준 target(천간/지지)의 십신"""
-    d_elem = get_element_idx(day_stem)
-    t_elem = get_element_idx(target)
-    relation = (t_elem - d_elem) % 5  # 0~4
-
-    d_pol = get_polarity(day_stem)
-    t_pol = get_polarity(target)
-
-    # 지지의 체/용 논쟁은 많으나, 여기서는 기본 홀짝 규칙을 유지합니다.
-    is_diff = 1 if d_pol != t_pol else 0
-    return SIPSIN_NAMES[relation][is_diff]
+# 글자 -> 인덱스 (list.index 선형 탐색 대신 dict 조회)
+STEM_IDX = {s: i for i, s in enumerate(STEMS)}
+BRANCH_IDX = {b: i for i, b in enumerate(BRANCHES)}
+# 천간+지지 통합 인덱스 (0~9: 천간, 10~21: 지지). 음양은 두 경우 모두 index % 2.
+ALL_IDX = {c: i for i, c in enumerate(STEMS + BRANCHES)}
+ALL_ELEMENTS = STEM_ELEMENTS + BRANCH_ELEMENTS
+
+# 십신 표: SIPSIN_TABLE[일간 index][대상 통합 index]
+SIPSIN_TABLE = [
+    [SIPSIN_NAMES[(ALL_ELEMENTS[t] - STEM_ELEMENTS[d]) % 5][int(d % 2 != t % 2)] for t in range(22)]
+    for d in range(10)
+]
 
-def get_12unseong(stem: str, branch: str) -> str:
-    """해당 천간(stem)의 장생 위치를 기준으로 지지(branch)의 십이운성"""
-    start_map = {
-        "甲": ("亥", 1), "丙": ("寅", 1), "戊": ("寅", 1), "庚": ("巳", 1), "壬": ("申", 1),
-        "乙": ("午", -1), "丁": ("酉", -1), "己": ("酉", -1), "辛": ("子", -1), "癸": ("卯", -1),
-    }
-    start_branch, direction = start_map[stem]
-    start_idx = BRANCHES.index(start_branch)
-    target_idx = BRANCHES.index(branch)
+# 천간별 장생 지지와 진행 방향 (양간 순행, 음간 역행)
+UNSEONG_START = {
+    "甲": ("亥", 1), "丙": ("寅", 1), "戊": ("寅", 1), "庚": ("巳", 1), "壬": ("申", 1),
+    "乙": ("午", -1), "丁": ("酉", -1), "己": ("酉", -1), "辛": ("子", -1), "癸": ("卯", -1),
+}
+# 십이운성 표: UNSEONG_TABLE[천간 index][지지 index] (장생이 UNSEONG_ORDER index=3)
+UNSEONG_TABLE = [
+    [
+        UNSEONG_ORDER[(3 + (b - BRANCH_IDX[UNSEONG_START[s][0]]) * UNSEONG_START[s][1]) % 12]
+        for b in range(12)
+    ]
+    for s in STEMS
+]
 
-    if direction == 1:
-        diff = (target_idx - start_idx) % 12
-    else:
-        diff = (start_idx - target_idx) % 12
+# 글자별 완성된 타일 HTML (오행 채움색/글자색) — 렌더링 시 dict 조회만
+TILE_HTML = {
+    c: f'<div class="tile" style="background:{ELEM_FILL[ALL_ELEMENTS[i]]}; color:{ELEM_TEXT[ALL_ELEMENTS[i]]};">{c}</div>'
+    for c, i in ALL_IDX.items()
+}
+# 지장간 문자열 (사용자 지정 순서: 초기→중기→정기)
+HIDDEN_STR = {b: "".join(stems) for b, stems in HIDDEN_STEMS.items()}
+HIDDEN_STR_BY_IDX = tuple(HIDDEN_STR[b] for b in BRANCHES)  # [branch index]
+
+def _sipsin_for_day(day_stem: str):
+    """일간 고정 십신 조회: 일간 행을 한 번만 찾아 두고 target(천간/지지)만 조회하는 함수 반환"""
+    row = SIPSIN_TABLE[STEM_IDX[day_stem]]
+    return lambda target: row[ALL_IDX[target]]
 
-    final_idx = (3 + diff) % 12  # 장생이 index=3
-    return UNSEONG_ORDER[final_idx]
+def get_12unseong(stem: str, branch: str) -> str:
+    """해당 천간(stem)의 장생 위치를 기준으로 지지(branch)의 십이운성"""
+    return UNSEONG_TABLE[STEM_IDX[stem]][BRANCH_IDX[branch]]
 
-def sexagenary_for_year(year: int) -> tuple[str, str, str]:
-    """서기 year의 연간지(절기 기준과 무관한 단순 연간지; 세운 표시에 사용)"""
-    idx60 = (year - 1984) % 60  # 1984=甲子
-    s = STEMS[idx60 % 10]
-    b = BRANCHES[idx60 % 12]
-    return s, b, f"{s}{b}"
+# 60갑자 표 (index 0 = 甲子)
+JIAZI_IDX = tuple((i % 10, i % 12) for i in range(60))  # (천간 index, 지지 index)
+JIAZI_STEM = tuple(STEMS[si] for si, _ in JIAZI_IDX)
+JIAZI_BRANCH = tuple(BRANCHES[bi] for _, bi in JIAZI_IDX)
+JIAZI_STR = tuple(s + b for s, b in zip(JIAZI_STEM, JIAZI_BRANCH))
 
 
 # 12 "절"(節) that start the BaZi solar months (월주 기준 절입)
@@ -135,6 +131,10 @@ MAJOR_TERMS = [
     ("대설(大雪)", 255.0, "子"),
     ("소한(小寒)", 285.0, "丑"),
 ]
+# Parallel (SoA) views of MAJOR_TERMS; index 0 = 입춘 / 寅 month
+TERM_NAMES_12 = tuple(name for name, _, _ in MAJOR_TERMS)
+TERM_LONS_12 = tuple(lon for _, lon, _ in MAJOR_TERMS)
+TERM_BRANCHES_12 = tuple(branch for _, _, branch in MAJOR_TERMS)
 
 
 # 24 solar terms (태양 황경 15° 경계). Used for Luck Pillar starting age (기운).
@@ -164,6 +164,9 @@ SOLAR_TERMS_24 = [
     ("소한(小寒)", 285.0),
     ("대한(大寒)", 300.0),
 ]
+# Parallel (SoA) views of SOLAR_TERMS_24 for the lookup paths
+TERM_NAMES_24 = tuple(name for name, _ in SOLAR_TERMS_24)
+TERM_LONS_24 = tuple(lon for _, lon in SOLAR_TERMS_24)
 
 # Year stem -> month stem of 寅 month (입춘~경칩)
 Y_STEM_TO_YIN_MONTH_STEM = {
@@ -183,161 +186,218 @@ D_STEM_TO_ZI_HOUR_STEM = {
     "戊": "壬", "癸": "壬",
 }
 
-TF = TimezoneFinder()
-def draw_pillar_card(title: str, stem: str, branch: str, day_stem: str):
-    s_elem = get_element_idx(stem)
-    b_elem = get_element_idx(branch)
-    s_color = ELEM_COLORS[s_elem]
-    b_color = ELEM_COLORS[b_elem]
+# Same maps keyed by stem index, giving a stem index
+YIN_STEM_IDX = tuple(STEM_IDX[Y_STEM_TO_YIN_MONTH_STEM[s]] for s in STEMS)
+ZI_HOUR_STEM_IDX = tuple(STEM_IDX[D_STEM_TO_ZI_HOUR_STEM[s]] for s in STEMS)
 
-    s_sipsin = "본원" if title.startswith("일주") else get_sipsin(day_stem, stem)
-    b_sipsin = get_sipsin(day_stem, branch)
-    unseong = get_12unseong(stem, branch)
+# HOUR_TABLE[day stem index][hour branch index] -> (hour stem, hour branch, 간지)
+HOUR_TABLE = [
+    [
+        (STEMS[(ZI_HOUR_STEM_IDX[d] + h) % 10], BRANCHES[h],
+         STEMS[(ZI_HOUR_STEM_IDX[d] + h) % 10] + BRANCHES[h])
+        for h in range(12)
+    ]
+    for d in range(10)
+]
 
-    html = f"""
-    <div class="card">
-      <div class="card-title">{title}</div>
-      <div class="kv">천간 십신: <b>{s_sipsin}</b> / 지지 십신: <b>{b_sipsin}</b></div>
-      <hr class="soft" />
-      <div class="big"><span style="color:{s_color}">{stem}</span><span style="opacity:0.5"> </span><span style="color:{b_color}">{branch}</span></div>
-      <div class="small">십이운성: <b>{unseong}</b></div>
-    </div>
+# Process-wide resources, shared across Streamlit sessions and reruns.
+# Heavy modules (swisseph, timezonefinder, requests) are imported on first use,
+# so the input form renders before they are loaded.
+@st.cache_resource(show_spinner=False)
+def _tz_finder():
+    from timezonefinder import TimezoneFinder
+    # in_memory: load the boundary data into RAM once for fast repeated queries
+    return TimezoneFinder(in_memory=True)
+
+@st.cache_resource(show_spinner=False)
+def _swe():
+    """
+    Import swisseph and pick the ephemeris once per process.
+    Returns (swe module, calc flag): with Swiss Ephemeris data files (sepl_*.se1)
+    in SWISSEPH_PATH (default: ./ephe) use them (FLG_SWIEPH); otherwise use the
+    analytical Moshier ephemeris directly (FLG_MOSEPH) — no file I/O, and far
+    more precise than the 15° term boundaries need.
     """
-    st.markdown(dedent(html), unsafe_allow_html=True)
+    import swisseph as swe
+    path = os.environ.get("SWISSEPH_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ephe"))
+    if glob.glob(os.path.join(path, "sepl*.se1")):
+        swe.set_ephe_path(path)
+        return swe, swe.FLG_SWIEPH
+    swe.set_ephe_path(None)
+    return swe, swe.FLG_MOSEPH
+
+@st.cache_data(max_entries=4096, show_spinner=False)
+def _solcross_cached(lon: float, jd_bucket: float) -> float:
+    """
+    swe.solcross_ut memoized on (term longitude, integer-day search start).
+    Streamlit reruns recompute the same chart repeatedly; the start day is
+    floored so that reruns for the same birth hit the cache.
+    """
+    swe, flags = _swe()
+    return swe.solcross_ut(lon, jd_bucket, flags)
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def sun_longitude(jd_ut: float) -> float:
+    """Apparent ecliptic longitude of the Sun (degrees, 0~360) at jd_ut."""
+    swe, flags = _swe()
+    return swe.calc_ut(jd_ut, swe.SUN, flags)[0][0]
 
 
 # ---------- Helpers ----------
+UNIX_EPOCH = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+JD_UNIX_EPOCH = 2440587.5  # Julian day of 1970-01-01 00:00 UT
+
+# Each field accepts what int() does (Unicode/full-width digits, sign, surrounding
+# spaces); the range check below reports values like 123:00.
+_HMS_NUM = r"\s*([+-]?\d+(?:_\d+)*)\s*"
+_HMS_RE = re.compile(rf"^{_HMS_NUM}:{_HMS_NUM}(?::{_HMS_NUM})?$")
+
 def parse_hms(s: str) -> dt.time:
     s = (s or "").strip()
-    parts = s.split(":")
-    if len(parts) not in (2, 3):
-        raise ValueError("시간 형식은 HH:MM 또는 HH:MM:SS 여야 합니다.")
-    try:
-        hh = int(parts[0])
-        mm = int(parts[1])
-        ss = int(parts[2]) if len(parts) == 3 else 0
-    except Exception:
+    m = _HMS_RE.match(s)
+    if not m:
+        if s.count(":") not in (1, 2):
+            raise ValueError("시간 형식은 HH:MM 또는 HH:MM:SS 여야 합니다.")
         raise ValueError("시간은 숫자로 입력해 주세요. (예: 09:30 또는 09:30:00)")
+    hh, mm, ss = int(m.group(1)), int(m.group(2)), int(m.group(3) or 0)
     if not (0 <= hh <= 23 and 0 <= mm <= 59 and 0 <= ss <= 59):
         raise ValueError("시간 값 범위가 올바르지 않습니다.")
     return dt.time(hh, mm, ss)
 
 def jd_ut_from_utc(dt_utc: dt.datetime) -> float:
-    # swisseph.julday takes decimal hour in UT
-    hour = dt_utc.hour + dt_utc.minute/60 + dt_utc.second/3600 + dt_utc.microsecond/3.6e9
-    return swe.julday(dt_utc.year, dt_utc.month, dt_utc.day, hour, swe.GREG_CAL)
+    # JD(UT) straight from epoch seconds (proleptic Gregorian, same as swe.julday GREG_CAL)
+    return dt_utc.timestamp() / 86400.0 + JD_UNIX_EPOCH
 
 def utc_from_jd_ut(jd_ut: float) -> dt.datetime:
-    y, m, d, hour = swe.revjul(jd_ut, swe.GREG_CAL)
-    hh = int(hour)
-    minute = int((hour - hh) * 60)
-    sec = int(round((((hour - hh) * 60) - minute) * 60))
-    # normalize
-    if sec == 60:
-        sec = 0
-        minute += 1
-    if minute == 60:
-        minute = 0
-        hh += 1
-    # hour may become 24
-    base = dt.datetime(y, m, d, 0, 0, 0, tzinfo=dt.timezone.utc)
-    return base + dt.timedelta(hours=hh, minutes=minute, seconds=sec)
+    # whole seconds since the Unix epoch (JD 2440587.5), rounded like the display
+    sec = round((jd_ut - JD_UNIX_EPOCH) * 86400.0)
+    return UNIX_EPOCH + dt.timedelta(seconds=sec)
+
+# Shared across reruns/sessions (module globals are rebuilt on every Streamlit rerun)
+@st.cache_resource(show_spinner=False)
+def _session():
+    """HTTP session for geocoding: keep-alive connection pool + retry (network can be flaky)."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    s = requests.Session()
+    s.headers.update({"User-Agent": "manseryeok-prototype/0.1"})
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+    s.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=8, max_retries=retry))
+    s.mount("http://", HTTPAdapter(pool_connections=8, pool_maxsize=8, max_retries=retry))
+    return s
+
+@st.cache_resource(show_spinner=False)
+def _geocode_pool() -> ThreadPoolExecutor:
+    """Worker threads for racing geocoding providers."""
+    return ThreadPoolExecutor(max_workers=6)
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def _tz_lookup(lat_r: float, lon_r: float) -> str | None:
+    return _tz_finder().timezone_at(lat=lat_r, lng=lon_r)
 
 def get_timezone_name(lat: float, lon: float) -> str | None:
-    return TF.timezone_at(lat=lat, lng=lon)
+    # ~100m grid: far finer than any timezone boundary, so reruns hit the cache
+    return _tz_lookup(round(lat, 3), round(lon, 3))
 
 def geocode(place: str, limit: int = 5):
     """
     Geocoding with minimal user setup.
 
     Priority:
-    1) Geoapify (if GEOAPIFY_KEY is set)
-    2) Open-Meteo geocoding (no key)
-    3) Nominatim (OSM) as last resort
+    1) Geoapify (if GEOAPIFY_KEY is set) and Open-Meteo geocoding (no key),
+       queried concurrently — the first non-empty answer wins
+    2) Nominatim (OSM) as last resort
 
+    Results are cached on disk per (normalized query, limit, key), so typing the
+    same place again does not re-hit the providers (Nominatim allows 1 req/s).
     Returns list of {label, lat, lon, country, city}.
     """
     place = place.strip()
     if not place:
         return []
-
     key = os.environ.get("GEOAPIFY_KEY", "").strip()
-    results = []
+    return _geocode_cached(place.lower(), limit, key, place)
 
-    # Small retry helper (network can be flaky)
-    def _get(url, *, params=None, headers=None, timeout=20, tries=3):
-        last = None
-        for i in range(tries):
-            try:
-                return requests.get(url, params=params, headers=headers, timeout=timeout)
-            except Exception as e:
-                last = e
-        raise last
-
-    # 1) Geoapify (key-based, best quality)
+# persist="disk": survives restarts (Streamlit ignores ttl for persisted caches)
+@st.cache_data(persist="disk", max_entries=1024, show_spinner=False)
+def _geocode_cached(query_key: str, limit: int, key: str, _place: str):
+    """
+    query_key (lowercased) is the cache key; _place is the user's spelling, sent to
+    the providers and used as the fallback label (underscore: not hashed by Streamlit).
+    """
+    place = _place
+    # resolve shared resources here, in the script thread, and hand them to the workers
+    session, pool = _session(), _geocode_pool()
+    futures = [pool.submit(_geocode_open_meteo, session, place, limit)]
     if key:
-        url = "https://api.geoapify.com/v1/geocode/search"
-        params = {"text": place, "limit": limit, "format": "json", "apiKey": key}
-        r = _get(url, params=params, timeout=20, tries=2)
-        r.raise_for_status()
-        data = r.json()
-        for feat in data.get("results", []):
-            results.append({
-                "label": feat.get("formatted") or feat.get("name") or place,
-                "lat": float(feat["lat"]),
-                "lon": float(feat["lon"]),
-                "country": feat.get("country"),
-                "city": feat.get("city") or feat.get("state"),
-            })
+        futures.append(pool.submit(_geocode_geoapify, session, place, limit, key))
+    results = _first_nonempty(futures)
+    if results:
         return results
 
-    # 2) Open-Meteo geocoding (no key, usually reliable)
+    # Nominatim fallback (may timeout / rate-limit on some networks)
+    return _geocode_nominatim(session, place, limit)
+
+def _first_nonempty(futures) -> list:
+    """Return the first successful non-empty result; cancel whatever is still pending."""
+    pending = set(futures)
     try:
-        url = "https://geocoding-api.open-meteo.com/v1/search"
-        params = {"name": place, "count": limit, "language": "en", "format": "json"}
-        r = _get(url, params=params, timeout=20, tries=3)
-        r.raise_for_status()
-        data = r.json()
-        for feat in (data.get("results") or []):
-            label_parts = [feat.get("name"), feat.get("admin1"), feat.get("country")]
-            label = ", ".join([p for p in label_parts if p])
-            results.append({
-                "label": label or place,
-                "lat": float(feat["latitude"]),
-                "lon": float(feat["longitude"]),
-                "country": feat.get("country"),
-                "city": feat.get("name"),
-            })
-        if results:
-            return results
-    except Exception:
-        # fall through to Nominatim
-        pass
-
-    # 3) Nominatim fallback (may timeout / rate-limit on some networks)
-    url = "https://nominatim.openstreetmap.org/search"
-    headers = {"User-Agent": "manseryeok-prototype/0.1"}
-    params = {"q": place, "format": "json", "limit": str(limit)}
-    r = _get(url, params=params, headers=headers, timeout=25, tries=3)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None and f.result():
+                    return f.result()
+    finally:
+        for f in pending:
+            f.cancel()
+    return []
+
+def _geocode_geoapify(session, place: str, limit: int, key: str) -> list:
+    # key-based, best quality
+    url = "https://api.geoapify.com/v1/geocode/search"
+    params = {"text": place, "limit": limit, "format": "json", "apiKey": key}
+    r = session.get(url, params=params, timeout=20)
     r.raise_for_status()
     data = r.json()
-    for feat in data:
+    results = []
+    for feat in data.get("results", []):
         results.append({
-            "label": feat.get("display_name", place),
+            "label": feat.get("formatted") or feat.get("name") or place,
             "lat": float(feat["lat"]),
             "lon": float(feat["lon"]),
-            "country": None,
-            "city": None,
+            "country": feat.get("country"),
+            "city": feat.get("city") or feat.get("state"),
+        })
+    return results
+
+def _geocode_open_meteo(session, place: str, limit: int) -> list:
+    # no key, usually reliable
+    url = "https://geocoding-api.open-meteo.com/v1/search"
+    params = {"name": place, "count": limit, "language": "en", "format": "json"}
+    r = session.get(url, params=params, timeout=20)
+    r.raise_for_status()
+    data = r.json()
+    results = []
+    for feat in (data.get("results") or []):
+        label_parts = [feat.get("name"), feat.get("admin1"), feat.get("country")]
+        label = ", ".join([p for p in label_parts if p])
+        results.append({
+            "label": label or place,
+            "lat": float(feat["latitude"]),
+            "lon": float(feat["longitude"]),
+            "country": feat.get("country"),
+            "city": feat.get("name"),
         })
     return results
 
-    # Nominatim fallback
+def _geocode_nominatim(session, place: str, limit: int) -> list:
     url = "https://nominatim.openstreetmap.org/search"
-    headers = {"User-Agent": "manseryeok-prototype/0.1 (contact: example@example.com)"}
     params = {"q": place, "format": "json", "limit": str(limit)}
-    r = requests.get(url, params=params, headers=headers, timeout=10)
+    r = session.get(url, params=params, timeout=25)
     r.raise_for_status()
     data = r.json()
+    results = []
     for feat in data:
         results.append({
             "label": feat.get("display_name", place),
@@ -348,26 +408,24 @@ def geocode(place: str, limit: int = 5):
         })
     return results
 
-def apparent_solar_datetime(utc_dt: dt.datetime, lon_deg: float) -> tuple[dt.datetime, float]:
+def apparent_solar_jd(jd_ut: float, lon_deg: float) -> tuple[float, float]:
     """
-    Compute Local Apparent Time (LAT, 진태양시) at given longitude, using:
+    Compute Local Apparent Time (LAT, 진태양시) at given longitude, as a Julian day:
     LMT = UTC + lon*240s
     EoT = LAT - LMT (equation of time), from swe.time_equ(jd_ut) [days]
     LAT = UTC + lon*240s + EoT*86400s
-    Returns (lat_dt_as_utc_tzaware, eot_minutes)
+    Returns (jd_lat, eot_minutes); jd_lat is on the UT scale but represents LAT.
     """
-    jd_ut = jd_ut_from_utc(utc_dt)
+    swe, _ = _swe()
     eot_days = swe.time_equ(jd_ut)  # days
-    eot_sec = eot_days * 86400.0
-    lon_sec = lon_deg * 240.0  # 1 degree = 4 minutes = 240 seconds
-    lat_dt = utc_dt + dt.timedelta(seconds=(lon_sec + eot_sec))
-    return lat_dt, eot_days * 24 * 60
+    # 1 degree = 4 minutes = 240 seconds = 1/360 day
+    return jd_ut + lon_deg / 360.0 + eot_days, eot_days * 24 * 60
 
 
 
 def is_yang_stem(stem: str) -> bool:
     # 甲丙戊庚壬 = 양, 乙丁己辛癸 = 음
-    return stem in ("甲","丙","戊","庚","壬")
+    return STEM_IDX[stem] % 2 == 0
 
 def luck_direction(year_stem: str, gender: str) -> str:
     """
@@ -384,30 +442,28 @@ def luck_direction(year_stem: str, gender: str) -> str:
 def adjacent_solar_term(jd_ut_birth: float, forward: bool) -> tuple[str, float, float]:
     """
     Find the next/previous solar-term crossing (15° boundaries) around birth, in UT.
+    The sun's longitude at birth picks the starting term, so usually one crossing is solved.
     Returns (term_name, term_lon, term_jd_ut).
     """
+    k = int(((sun_longitude(jd_ut_birth) - 315.0) % 360.0) // 15.0) % 24  # 0=입춘
+    # Scan outward from k and stop at the first crossing on the right side of birth.
+    # This normally ends on the first term; the next one only matters when birth
+    # sits on a term boundary and the longitude rounds to the other side.
     if forward:
-        best = None
-        for name, lon in SOLAR_TERMS_24:
-            jx = swe.solcross_ut(lon, jd_ut_birth, swe.FLG_SWIEPH)
+        jd_start = math.floor(jd_ut_birth)
+        for offset in range(1, 25):
+            i = (k + offset) % 24
+            jx = _solcross_cached(TERM_LONS_24[i], jd_start)
             if jx > jd_ut_birth:
-                if (best is None) or (jx < best[2]):
-                    best = (name, lon, jx)
-        if best is None:
-            name, lon = SOLAR_TERMS_24[0]
-            best = (name, lon, swe.solcross_ut(lon, jd_ut_birth + 1.0, swe.FLG_SWIEPH))
-        return best
+                return TERM_NAMES_24[i], TERM_LONS_24[i], jx
     else:
-        best = None
-        for name, lon in SOLAR_TERMS_24:
-            jx = swe.solcross_ut(lon, jd_ut_birth - 40.0, swe.FLG_SWIEPH)
+        jd_start = math.floor(jd_ut_birth - 40.0)
+        for offset in range(24):
+            i = (k - offset) % 24
+            jx = _solcross_cached(TERM_LONS_24[i], jd_start)
             if jx <= jd_ut_birth:
-                if (best is None) or (jx > best[2]):
-                    best = (name, lon, jx)
-        if best is None:
-            name, lon = SOLAR_TERMS_24[-1]
-            best = (name, lon, swe.solcross_ut(lon, jd_ut_birth - 80.0, swe.FLG_SWIEPH))
-        return best
+                return TERM_NAMES_24[i], TERM_LONS_24[i], jx
+    raise ValueError("인접 절기 시각을 찾지 못했습니다.")
 
 def minutes_to_luck_ymd(total_minutes: float) -> tuple[int, int, int]:
     """
@@ -417,25 +473,14 @@ def minutes_to_luck_ymd(total_minutes: float) -> tuple[int, int, int]:
       1 hour = 5 days  -> 12 minutes  = 1 day (luck-days)
     Returns (years, months, days).
     """
-    if total_minutes < 0:
-        total_minutes = -total_minutes
-
-    years = int(total_minutes // 4320)
-    rem = total_minutes - years * 4320
-
-    months = int(rem // 360)
-    rem = rem - months * 360
-
-    days = int(round(rem / 12.0))
+    years, rem = divmod(abs(total_minutes), 4320)
+    months, rem = divmod(rem, 360)
+    days = round(rem / 12.0)
 
-    # normalize
-    if days >= 30:
-        months += days // 30
-        days = days % 30
-    if months >= 12:
-        years += months // 12
-        months = months % 12
-    return years, months, days
+    # normalize (days may round up to 30)
+    months, days = months + days // 30, days % 30
+    years, months = years + months // 12, months % 12
+    return int(years), int(months), days
 
 def build_luck_pillars(month_stem: str, month_branch: str, direction: str, count: int = 10):
     """
@@ -443,107 +488,183 @@ def build_luck_pillars(month_stem: str, month_branch: str, direction: str, count
     By convention, the first luck pillar starts from the *next* (or previous) stem-branch after the month pillar.
     """
     step = 1 if direction == "순행" else -1
-    si = STEMS.index(month_stem)
-    bi = BRANCHES.index(month_branch)
-    pillars = []
-    for i in range(1, count + 1):
-        s = STEMS[(si + step * i) % 10]
-        b = BRANCHES[(bi + step * i) % 12]
-        pillars.append((s, b, f"{s}{b}"))
-    return pillars
-
-def early_zi_shift(date_dt: dt.datetime) -> dt.date:
-    """
-    Apply early Zi (자시=23:00부터 다음 날) rule to a datetime already expressed in the clock you want to use.
-    """
-    if date_dt.time() >= dt.time(23, 0, 0):
-        return (date_dt.date() + dt.timedelta(days=1))
-    return date_dt.date()
+    # 60갑자 index of the month pillar: n % 10 == stem, n % 12 == branch
+    i60 = (6 * STEM_IDX[month_stem] - 5 * BRANCH_IDX[month_branch]) % 60
+    idx = [(i60 + step * k) % 60 for k in range(1, count + 1)]
+    return [(JIAZI_STEM[i], JIAZI_BRANCH[i], JIAZI_STR[i]) for i in idx]
+
+def build_daewoon_rows(month_stem: str, month_branch: str, direction: str,
+                       start_age: float, count: int = 10) -> list[dict]:
+    """대운 표 행: 월주에서 이어지는 간지 + 10년 단위 시작/끝 나이"""
+    rows = []
+    for i, (_, _, sb) in enumerate(build_luck_pillars(month_stem, month_branch, direction, count)):
+        st_age = start_age + i * 10.0
+        ed_age = st_age + 10.0
+        rows.append({
+            "순서": i + 1,
+            "대운": sb,
+            "시작(표기)": fmt_age_year_month(st_age),
+            "끝(표기)": fmt_age_year_month(ed_age),
+            "시작(세)": round(st_age, 2),
+            "끝(세)": round(ed_age, 2),
+        })
+    return rows
 
 def sexagenary_from_jdn(jdn: int) -> tuple[str, str]:
     """
     Using the widely-cited formula: (JDN + 49) mod 60, where 0 => 甲子.
     """
     idx = (jdn + 49) % 60
-    stem = STEMS[idx % 10]
-    branch = BRANCHES[(idx % 12)]  # 0=子 ... 11=亥
-    return stem, branch
+    return JIAZI_STEM[idx], JIAZI_BRANCH[idx]
 
 def jdn_from_gregorian_date(y: int, m: int, d: int) -> int:
-    jd0 = swe.julday(y, m, d, 0.0, swe.GREG_CAL)
-    return int(math.floor(jd0 + 0.5))
+    # Fliegel–Van Flandern integer formula (proleptic Gregorian).
+    # The original C form uses truncating (m-14)/12, i.e. -1 for Jan/Feb and 0 otherwise.
+    a = -1 if m <= 2 else 0
+    return ((1461 * (y + 4800 + a)) // 4 + (367 * (m - 2 - 12 * a)) // 12
+            - (3 * ((y + 4900 + a) // 100)) // 4 + d - 32075)
 
-def year_pillar(jd_ut_birth: float) -> tuple[str, str, int, float]:
+def year_pillar(jd_ut_birth: float, sun_lon: float | None = None) -> tuple[str, str, int, float]:
     """
     Year pillar changes at LiChun (315°). Compare in UT.
+    sun_lon: the Sun's longitude at birth, if the caller already has it.
     Returns (stem, branch, pillar_year, lichun_jd_ut)
     """
+    if sun_lon is None:
+        sun_lon = sun_longitude(jd_ut_birth)
     birth_utc = utc_from_jd_ut(jd_ut_birth)
-    y = birth_utc.year
-    jd_start = swe.julday(y, 1, 1, 0.0, swe.GREG_CAL) - 5.0
-    lichun = swe.solcross_ut(315.0, jd_start, swe.FLG_SWIEPH)
-    if jd_ut_birth < lichun:
+    y, m = birth_utc.year, birth_utc.month
+    # 1월 1일~입춘 전: 태양 황경 270°(동지)~315°(입춘) 구간이면 아직 전년도 연주
+    if m <= 2 and 270.0 <= sun_lon < 315.0:
         y -= 1
-        jd_start = swe.julday(y, 1, 1, 0.0, swe.GREG_CAL) - 5.0
-        lichun = swe.solcross_ut(315.0, jd_start, swe.FLG_SWIEPH)
+    # search from ~5 days before Jan 1 00:00 UT (JD = JDN - 0.5)
+    lichun = _solcross_cached(315.0, jdn_from_gregorian_date(y, 1, 1) - 5.5)
     idx = (y - 1984) % 60  # 1984 = 甲子
-    return STEMS[idx % 10], BRANCHES[idx % 12], y, lichun
+    return JIAZI_STEM[idx], JIAZI_BRANCH[idx], y, lichun
 
-def month_pillar(jd_ut_birth: float, year_stem: str) -> tuple[str, str, str, float]:
+def month_pillar(jd_ut_birth: float, year_stem: str, sun_lon: float | None = None) -> tuple[str, str, str, float]:
     """
     Month pillar changes at the 12 major terms (절입) listed in MAJOR_TERMS.
+    sun_lon: the Sun's longitude at birth, if the caller already has it.
     Returns (stem, branch, term_name, term_jd_ut)
     """
-    best = None
-    for name, lon, branch in MAJOR_TERMS:
-        jx = swe.solcross_ut(lon, jd_ut_birth - 40.0, swe.FLG_SWIEPH)
-        if jx <= jd_ut_birth:
-            if (best is None) or (jx > best[3]):
-                best = (name, lon, branch, jx)
-    if best is None:
-        # should never happen, but guard anyway
-        best = (MAJOR_TERMS[0][0], MAJOR_TERMS[0][1], MAJOR_TERMS[0][2], swe.solcross_ut(MAJOR_TERMS[0][1], jd_ut_birth - 80.0, swe.FLG_SWIEPH))
-    term_name, lon, m_branch, term_jd = best
-
-    # month branch index where 寅 month = 0
-    order = ["寅","卯","辰","巳","午","未","申","酉","戌","亥","子","丑"]
-    m_idx = order.index(m_branch)
-
-    yin_month_stem = Y_STEM_TO_YIN_MONTH_STEM[year_stem]
-    base = STEMS.index(yin_month_stem)
-    m_stem = STEMS[(base + m_idx) % 10]
+    if sun_lon is None:
+        sun_lon = sun_longitude(jd_ut_birth)
+    # month index where 寅 month (입춘, 315°) = 0; MAJOR_TERMS is in the same order
+    m_idx = int(((sun_lon - 315.0) % 360.0) // 30.0) % 12
+    # the current 절 is at most ~31.5 days back; start just before that
+    term_jd = _solcross_cached(TERM_LONS_12[m_idx], math.floor(jd_ut_birth - 32.0))
+    term_name, m_branch = TERM_NAMES_12[m_idx], TERM_BRANCHES_12[m_idx]
+
+    m_stem = STEMS[(YIN_STEM_IDX[STEM_IDX[year_stem]] + m_idx) % 10]
     return m_stem, m_branch, term_name, term_jd
 
-def day_pillar(lat_dt: dt.datetime, use_early_zi: bool = True) -> tuple[str, str, dt.date, int]:
+def day_pillar(jd_lat: float, use_early_zi: bool = True) -> tuple[str, str, dt.date, int]:
     """
     Day pillar is computed from the *local apparent* date (LAT) by default,
-    then optionally shifted by early Zi (23:00 boundary).
+    then optionally shifted by early Zi (자시=23:00부터 다음 날).
+    jd_lat: LAT expressed as a Julian day (civil days start at JD x.5).
     """
-    day_date = early_zi_shift(lat_dt) if use_early_zi else lat_dt.date()
-    jdn = jdn_from_gregorian_date(day_date.year, day_date.month, day_date.day)
+    jdn = math.floor(jd_lat + 0.5 + (1.0 / 24.0 if use_early_zi else 0.0))
     s, b = sexagenary_from_jdn(jdn)
-    return s, b, day_date, jdn
+    return s, b, dt.date.fromordinal(jdn - 1721425), jdn  # JDN 1721426 = 0001-01-01
 
-def hour_pillar(lat_dt: dt.datetime, day_stem: str) -> tuple[str, str, str]:
+def hour_pillar(jd_lat: float, day_stem: str) -> tuple[str, str, str]:
     """
-    Hour branch based on LAT.
+    Hour branch based on LAT (as a Julian day, floored like day_pillar).
     Hour stem determined from day stem.
     """
-    minutes = lat_dt.hour * 60 + lat_dt.minute + lat_dt.second / 60.0
-    h_branch_idx = int(((minutes + 60) // 120) % 12)  # 0=子
-    h_branch = BRANCHES[h_branch_idx]
+    secs = math.floor(((jd_lat + 0.5) % 1.0) * 86400.0)
+    h_branch_idx = ((secs + 3600) // 7200) % 12  # 0=子 (23:00~00:59)
+    return HOUR_TABLE[STEM_IDX[day_stem]][h_branch_idx]
+
+def compute_all_pillars(jd_ut: float, jd_lat: float, use_early_zi: bool = True):
+    """
+    Four pillars in one pass: the Sun's longitude is computed once and shared
+    by the year and month pillars.
+    Returns (y_stem, y_branch, m_stem, m_branch, d_stem, d_branch, h_stem, h_branch,
+             pillar_year, lichun_jd, term_jd, term_name, day_date, day_jdn)
+    """
+    sun_lon = sun_longitude(jd_ut)
+    y_stem, y_branch, pillar_year, lichun_jd = year_pillar(jd_ut, sun_lon)
+    m_stem, m_branch, term_name, term_jd = month_pillar(jd_ut, y_stem, sun_lon)
+    d_stem, d_branch, day_date, day_jdn = day_pillar(jd_lat, use_early_zi=use_early_zi)
+    h_stem, h_branch, _ = hour_pillar(jd_lat, d_stem)
+    return (y_stem, y_branch, m_stem, m_branch, d_stem, d_branch, h_stem, h_branch,
+            pillar_year, lichun_jd, term_jd, term_name, day_date, day_jdn)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def compute_all(birth_date: dt.date, time_str: str, basis: str, lat_q: float, lon_q: float,
+                gender_short: str, use_early_zi: bool = True) -> dict:
+    """
+    명식 + 대운 계산 전체 (렌더링 없음). 입력이 같으면 토글/선택 변경으로 인한
+    rerun에서 캐시된 결과를 그대로 사용합니다.
+    lat_q/lon_q: 반올림된 좌표(소수 4자리 ≈ 11m). Returns a dict of plain values.
+    """
+    birth_time = parse_hms(time_str)
+    naive = dt.datetime.combine(birth_date, birth_time)
+
+    tz_name = get_timezone_name(lat_q, lon_q)
+    tz_missing = tz_name is None
+    if tz_missing:
+        tz_name = "UTC"
+
+    if basis.startswith("표준시"):
+        local = naive.replace(tzinfo=ZoneInfo(tz_name))
+        utc_dt = local.astimezone(dt.timezone.utc)
+        basis_note = f"표준시({tz_name}) → UTC 변환"
+    else:
+        # Interpret naive as local mean time at longitude
+        utc_dt = naive.replace(tzinfo=dt.timezone.utc) - dt.timedelta(seconds=lon_q * 240.0)
+        basis_note = "LMT(지역평균태양시) → UTC 변환(경도 보정)"
+
+    jd_ut = jd_ut_from_utc(utc_dt)
+    jd_lat, eot_min = apparent_solar_jd(jd_ut, lon_q)
+    lat_dt = utc_from_jd_ut(jd_lat)  # display only: tz-aware UTC, but represents LAT
+
+    # Year / Month (UT 비교), Day / Hour (LAT 기준)
+    (y_stem, y_branch, m_stem, m_branch, d_stem, d_branch, h_stem, h_branch,
+     pillar_year, lichun_jd, term_jd, term_name, day_date, day_jdn) = compute_all_pillars(
+        jd_ut, jd_lat, use_early_zi=use_early_zi)
+
+    out = {
+        "tz_name": tz_name, "tz_missing": tz_missing, "basis_note": basis_note,
+        "utc_dt": utc_dt, "jd_ut": jd_ut, "lat_dt": lat_dt, "eot_min": eot_min,
+        "y_stem": y_stem, "y_branch": y_branch, "m_stem": m_stem, "m_branch": m_branch,
+        "d_stem": d_stem, "d_branch": d_branch, "h_stem": h_stem, "h_branch": h_branch,
+        "pillar_year": pillar_year, "term_name": term_name,
+        # display-only datetimes, converted once here instead of on every rerun
+        "term_utc": utc_from_jd_ut(term_jd), "lichun_utc": utc_from_jd_ut(lichun_jd),
+        "day_date": day_date, "day_jdn": day_jdn,
+        "daewoon": None, "daewoon_error": None,
+    }
 
-    zi_stem = D_STEM_TO_ZI_HOUR_STEM[day_stem]
-    base = STEMS.index(zi_stem)
-    h_stem = STEMS[(base + h_branch_idx) % 10]
-    return h_stem, h_branch, f"{h_stem}{h_branch}"
+    # ---- Luck Pillars (대운) ----
+    try:
+        direction = luck_direction(y_stem, gender_short)
+        term2_name, term2_lon, term2_jd = adjacent_solar_term(jd_ut, forward=(direction == "순행"))
+
+        # 실제 경과 시간(UT). 순행: next term - birth, 역행: birth - prev term
+        delta_min = (term2_jd - jd_ut) * 1440.0
+        if direction != "순행":
+            delta_min = -delta_min
+
+        years0, months0, days0 = minutes_to_luck_ymd(delta_min)
+        start_age = years0 + months0/12.0 + days0/360.0
+        out["daewoon"] = {
+            "direction": direction, "term2_name": term2_name, "term2_lon": term2_lon,
+            "delta_min": delta_min,
+            "years0": years0, "months0": months0, "days0": days0,
+            "rows": build_daewoon_rows(m_stem, m_branch, direction, start_age, count=10),
+        }
+    except Exception as e:
+        out["daewoon_error"] = str(e)
+    return out
 
 # ---------- Streamlit UI ----------
 st.set_page_config(page_title="만세력 변환 명식 찾기", layout="wide")
 
-st.markdown(
-    """
-<style>
+APP_CSS = """
 /* --- Pillar tiles (mobile manseoryeok-ish) --- */
 .pillars-wrap{display:flex; justify-content:center; gap:18px; margin-top:10px; margin-bottom:12px;}
 .pillar-col{width:120px; text-align:center;}
@@ -570,75 +691,49 @@ st.markdown(
 .scrollcell .top{font-size:12px; opacity:0.75; margin-bottom:6px;}
 .scrollcell .gj{font-size:30px; font-weight:900; line-height:1.05; margin-bottom:6px;}
 .scrollcell .meta{font-size:12px; opacity:0.8; line-height:1.2;}
-</style>
-""",
-    unsafe_allow_html=True
-)
+"""
 
+@st.cache_resource(show_spinner=False)
+def _style_tag() -> str:
+    """APP_CSS minified once per process (comments/whitespace stripped)."""
+    css = re.sub(r"/\*.*?\*/", "", APP_CSS, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{}:;,])\s*", r"\1", css)
+    return f"<style>{css.strip()}</style>"
 
-# ---------- UI style ----------
-st.markdown(
-    """
-<style>
-.card {
-  background: rgba(255,255,255,0.04);
-  border: 1px solid rgba(255,255,255,0.10);
-  border-radius: 14px;
-  padding: 14px 16px;
-}
-.card-title { font-size: 0.95rem; opacity: 0.85; margin-bottom: 6px; font-weight: 600; }
-.big { font-size: 2.6rem; font-weight: 800; line-height: 1.05; }
-.small { font-size: 0.95rem; opacity: 0.85; margin-top: 6px; }
-.kv { font-size: 0.9rem; opacity: 0.80; margin-top: 2px; }
-hr.soft { border: none; border-top: 1px solid rgba(255,255,255,0.08); margin: 10px 0; }
-</style>
-""",
-    unsafe_allow_html=True
-)
+# Streamlit rebuilds the page on every rerun, so the <style> element must be
+# emitted each run; only the (smaller) payload is cached.
+st.markdown(_style_tag(), unsafe_allow_html=True)
 
 
 BUILD_TAG = "easy27-2026-01-14"
 def render_pillars_tiles(y_stem, y_branch, m_stem, m_branch, d_stem, d_branch, h_stem, h_branch):
     """타일형 4주 표시: (왼쪽→오른쪽) 시주/일주/월주/연주 (연주가 맨 오른쪽)"""
-    pillars = [
-        ("시주", h_stem, h_branch),
-        ("일주", d_stem, d_branch),
-        ("월주", m_stem, m_branch),
-        ("연주", y_stem, y_branch),
-    ]
+    labels = ("시주", "일주", "월주", "연주")
+    stems = (h_stem, d_stem, m_stem, y_stem)
+    branches = (h_branch, d_branch, m_branch, y_branch)
 
-    cols_html = []
-    for label, s, b in pillars:
-        s_elem = get_element_idx(s)
-        b_elem = get_element_idx(b)
-
-        s_fill = ELEM_FILL[s_elem]
-        b_fill = ELEM_FILL[b_elem]
-        s_text = ELEM_TEXT[s_elem]
-        b_text = ELEM_TEXT[b_elem]
-
-        # 십신(일간 기준)
-        if label == "일주":
-            stem_sipsin = "본원"
-        else:
-            stem_sipsin = get_sipsin(d_stem, s)
-        branch_sipsin = get_sipsin(d_stem, b)
+    # 열(column) 단위로 한 번에 조회: 일간 기준 십신 행, 지장간 (타일은 TILE_HTML)
+    sipsin_fn = _sipsin_for_day(d_stem)
+    stem_sipsin = [sipsin_fn(c) for c in stems]
+    stem_sipsin[1] = "본원"  # 일주 천간 = 일간
+    branch_sipsin = [sipsin_fn(c) for c in branches]
+    hidden = [HIDDEN_STR.get(b, "") for b in branches]
 
-        # 지장간(사용자 지정 순서: 초기→중기→정기)
-        hidden = "".join(HIDDEN_STEMS.get(b, []))
-
-        cols_html.append(dedent(f"""
+    cols_html = []
+    for i in range(4):
+        cols_html.append(f"""
 <div class="pillarcol">
-  <div class="pillarlabel">{label}</div>
-  <div class="sipsin-top">{stem_sipsin}</div>
+  <div class="pillarlabel">{labels[i]}</div>
+  <div class="sipsin-top">{stem_sipsin[i]}</div>
 
-  <div class="tile" style="background:{s_fill}; color:{s_text};">{s}</div>
-  <div class="tile" style="background:{b_fill}; color:{b_text};">{b}</div>
+  {TILE_HTML[stems[i]]}
+  {TILE_HTML[branches[i]]}
 
-  <div class="hiddenstems">{hidden}</div>
-  <div class="sipsin-bot">{branch_sipsin}</div>
+  <div class="hiddenstems">{hidden[i]}</div>
+  <div class="sipsin-bot">{branch_sipsin[i]}</div>
 </div>
-""").strip())
+""".strip())
 
     st.markdown(f'<div class="pillars-wrap">{"".join(cols_html)}</div>', unsafe_allow_html=True)
 
@@ -670,24 +765,24 @@ def build_10year_seun_table(luck_row: dict, birth_solar_year: int, day_stem: str
     - birth_solar_year: the (solar) year used for 연주 계산 기준
     - day_stem: 일간(일주 천간) for 십신 산출
     """
-    start_age = float(luck_row.get("start_age", 0.0))
+    start_age = float(luck_row.get("시작(세)", luck_row.get("start_age", 0.0)))
     # 세운의 "연도"는 보통 시작 나이의 정수 부분을 출생 기준 연도에 더해 잡습니다.
-    start_year = int(birth_solar_year + math.floor(start_age + 1e-9))
+    start_year = birth_solar_year + int(start_age + 1e-9)
 
+    # 연도 → 60갑자 index → 천간/지지 index, 이후는 모두 표 조회
+    d = STEM_IDX[day_stem]
     rows: list[dict] = []
     for i in range(10):
-        y = start_year + i
-        age = start_age + i
-        ganji = sexagenary_for_year(y)
-        y_stem, y_branch = ganji[0], ganji[1]
+        n = (start_year + i - 1984) % 60  # 1984=甲子
+        si, bi = JIAZI_IDX[n]
         rows.append({
-            "연도": y,
-            "나이": fmt_age_year_month(age),
-            "세운": ganji,
-            "천간십신": get_sipsin(day_stem, y_stem),
-            "지지십신": get_sipsin(day_stem, y_branch),
-            "십이운성(천간→지지)": get_unseong_12(y_stem, y_branch),
-            "지장간": "".join(HIDDEN_STEMS.get(y_branch, [])),
+            "연도": start_year + i,
+            "나이": fmt_age_year_month(start_age + i),
+            "세운": JIAZI_STR[n],
+            "천간십신": SIPSIN_TABLE[d][si],
+            "지지십신": SIPSIN_TABLE[d][10 + bi],
+            "십이운성(천간→지지)": UNSEONG_TABLE[si][bi],
+            "지장간": HIDDEN_STR_BY_IDX[bi],
         })
     return rows
 
@@ -757,35 +852,24 @@ lon = st.number_input("경도(lon, 동경+ / 서경-)", value=float(st.session_s
 use_early_zi = True  # 고정: 자시(23:00)부터 다음 날(진태양시 LAT 기준)
 st.info("일자 경계는 **진태양시(LAT) 기준 23:00(자시)**부터 다음 날로 고정되어 있습니다.")
 
+# 마지막 "명식 계산" 입력을 보관: 토글/대운 선택 등 이후 rerun에서도 결과를 유지(계산은 캐시)
+current_inputs = (birth_date, time_str, basis, round(lat, 4), round(lon, 4), gender_short)
 if st.button("명식 계산"):
-    try:
-        birth_time = parse_hms(time_str)
-        naive = dt.datetime.combine(birth_date, birth_time)
+    st.session_state["chart_inputs"] = current_inputs
 
-        tz_name = get_timezone_name(lat, lon)
-        if tz_name is None:
+chart_inputs = st.session_state.get("chart_inputs")
+if chart_inputs:
+    if chart_inputs != current_inputs:
+        st.warning("입력이 변경됨 — 다시 계산하세요. (아래는 이전 입력으로 계산한 결과입니다)")
+    try:
+        c = compute_all(*chart_inputs, use_early_zi=use_early_zi)
+        lat_q, lon_q = chart_inputs[3], chart_inputs[4]
+        tz_name, basis_note, utc_dt, lat_dt, eot_min = c["tz_name"], c["basis_note"], c["utc_dt"], c["lat_dt"], c["eot_min"]
+        y_stem, y_branch, m_stem, m_branch = c["y_stem"], c["y_branch"], c["m_stem"], c["m_branch"]
+        d_stem, d_branch, h_stem, h_branch = c["d_stem"], c["d_branch"], c["h_stem"], c["h_branch"]
+        pillar_year, term_name = c["pillar_year"], c["term_name"]
+        if c["tz_missing"]:
             st.warning("해당 좌표의 시간대(IANA)를 찾지 못했습니다. 표준시 입력은 정확도가 떨어질 수 있습니다.")
-            tz_name = "UTC"
-
-        if basis.startswith("표준시"):
-            local = naive.replace(tzinfo=ZoneInfo(tz_name))
-            utc_dt = local.astimezone(dt.timezone.utc)
-            basis_note = f"표준시({tz_name}) → UTC 변환"
-        else:
-            # Interpret naive as local mean time at longitude
-            utc_dt = naive.replace(tzinfo=dt.timezone.utc) - dt.timedelta(seconds=lon * 240.0)
-            basis_note = "LMT(지역평균태양시) → UTC 변환(경도 보정)"
-
-        jd_ut = jd_ut_from_utc(utc_dt)
-        lat_dt, eot_min = apparent_solar_datetime(utc_dt, lon)  # tz-aware UTC, but represents LAT
-
-        # Year / Month (UT 비교)
-        y_stem, y_branch, pillar_year, lichun_jd = year_pillar(jd_ut)
-        m_stem, m_branch, term_name, term_jd = month_pillar(jd_ut, y_stem)
-
-        # Day / Hour (LAT 기준)
-        d_stem, d_branch, day_label_date, day_jdn = day_pillar(lat_dt, use_early_zi=use_early_zi)
-        h_stem, h_branch, h_sb = hour_pillar(lat_dt, d_stem)
 
         st.success("계산 완료")
         # ---- 4 Pillars (명식) : 타일형 ----
@@ -795,42 +879,43 @@ if st.button("명식 계산"):
         show_detail = st.toggle("상세 표시(십신/십이운성 표)", value=False)
         if show_detail:
             st.write("### 상세 정보(검증/참고용)")
+            sipsin_fn = _sipsin_for_day(d_stem)
             detail_rows = [
                 {
                     "주": "연주",
                     "천간": y_stem,
                     "지지": y_branch,
-                    "천간십신": get_sipsin(d_stem, y_stem),
-                    "지지십신": get_sipsin(d_stem, y_branch),
-                    "십이운성(천간→지지)": get_unseong_12(y_stem, y_branch),
-                    "지장간": "".join(HIDDEN_STEMS.get(y_branch, [])),
+                    "천간십신": sipsin_fn(y_stem),
+                    "지지십신": sipsin_fn(y_branch),
+                    "십이운성(천간→지지)": get_12unseong(y_stem, y_branch),
+                    "지장간": HIDDEN_STR[y_branch],
                 },
                 {
                     "주": "월주",
                     "천간": m_stem,
                     "지지": m_branch,
-                    "천간십신": get_sipsin(d_stem, m_stem),
-                    "지지십신": get_sipsin(d_stem, m_branch),
-                    "십이운성(천간→지지)": get_unseong_12(m_stem, m_branch),
-                    "지장간": "".join(HIDDEN_STEMS.get(m_branch, [])),
+                    "천간십신": sipsin_fn(m_stem),
+                    "지지십신": sipsin_fn(m_branch),
+                    "십이운성(천간→지지)": get_12unseong(m_stem, m_branch),
+                    "지장간": HIDDEN_STR[m_branch],
                 },
                 {
                     "주": "일주",
                     "천간": d_stem,
                     "지지": d_branch,
                     "천간십신": "본원",
-                    "지지십신": get_sipsin(d_stem, d_branch),
-                    "십이운성(천간→지지)": get_unseong_12(d_stem, d_branch),
-                    "지장간": "".join(HIDDEN_STEMS.get(d_branch, [])),
+                    "지지십신": sipsin_fn(d_branch),
+                    "십이운성(천간→지지)": get_12unseong(d_stem, d_branch),
+                    "지장간": HIDDEN_STR[d_branch],
                 },
                 {
                     "주": "시주",
                     "천간": h_stem,
                     "지지": h_branch,
-                    "천간십신": get_sipsin(d_stem, h_stem),
-                    "지지십신": get_sipsin(d_stem, h_branch),
-                    "십이운성(천간→지지)": get_unseong_12(h_stem, h_branch),
-                    "지장간": "".join(HIDDEN_STEMS.get(h_branch, [])),
+                    "천간십신": sipsin_fn(h_stem),
+                    "지지십신": sipsin_fn(h_branch),
+                    "십이운성(천간→지지)": get_12unseong(h_stem, h_branch),
+                    "지장간": HIDDEN_STR[h_branch],
                 },
             ]
             st.dataframe(detail_rows, use_container_width=True, hide_index=True)
@@ -839,53 +924,25 @@ if st.button("명식 계산"):
         with st.expander("텍스트 결과(4주) / 검증용 정보", expanded=False):
             st.write(f"연주: **{y_stem}{y_branch}**  (기준 연도: {pillar_year}, 입춘 기준)")
             st.write(f"월주: **{m_stem}{m_branch}**  (기준 절기: {term_name})")
-            st.write(f"일주: **{d_stem}{d_branch}**  (LAT 날짜: {day_label_date.isoformat()}, JDN={day_jdn})")
+            st.write(f"일주: **{d_stem}{d_branch}**  (LAT 날짜: {c['day_date'].isoformat()}, JDN={c['day_jdn']})")
             st.write(f"시주: **{h_stem}{h_branch}**  (LAT 시각 기준)")
 
 
         # ---- Luck Pillars (대운) ----
-        try:
-            direction = luck_direction(y_stem, gender_short)
-            term2_name, term2_lon, term2_jd = adjacent_solar_term(jd_ut, forward=(direction == "순행"))
-            term2_utc = utc_from_jd_ut(term2_jd)
-
-            if basis.startswith("표준시"):
-                birth_clock = utc_dt.astimezone(ZoneInfo(tz_name))
-                term_clock = term2_utc.astimezone(ZoneInfo(tz_name))
-                clock_note = f"표준시({tz_name}) 기준"
-            else:
-                birth_clock = utc_dt + dt.timedelta(seconds=lon * 240.0)
-                term_clock = term2_utc + dt.timedelta(seconds=lon * 240.0)
-                clock_note = "LMT(경도 보정) 기준"
-
-            # 순행: next term - birth, 역행: birth - prev term
-            delta_min = (term_clock - birth_clock).total_seconds() / 60.0
-            if direction != "순행":
-                delta_min = -delta_min
-
-            years0, months0, days0 = minutes_to_luck_ymd(delta_min)
-            luck_pillars = build_luck_pillars(m_stem, m_branch, direction, count=10)
+        if c["daewoon_error"]:
+            st.warning(f"대운 계산은 실패했습니다: {c['daewoon_error']}")
+        else:
+            dw = c["daewoon"]
+            direction, term2_name, term2_lon = dw["direction"], dw["term2_name"], dw["term2_lon"]
+            delta_min, rows = dw["delta_min"], dw["rows"]
+            years0, months0, days0 = dw["years0"], dw["months0"], dw["days0"]
 
             st.write("### 대운")
             st.write(f"- 대운 방향: **{direction}** (연간 음양 + 성별 기준)")
             st.write(f"- 기운 기준 절기: **{term2_name}** (λ={term2_lon:.0f}°)")
-            st.write(f"- 출생~절기 간격({clock_note}): **{abs(delta_min)/1440.0:.3f}일**")
+            st.write(f"- 출생~절기 간격(실제 경과 시간, UT): **{abs(delta_min)/1440.0:.3f}일**")
             st.write(f"- 대운수(기운 나이): **{years0}년 {months0}개월 {days0}일**  (표기: {years0}.{months0:02d})")
 
-            rows = []
-            start_age = years0 + months0/12.0 + days0/360.0
-            for i, (s, b, sb) in enumerate(luck_pillars):
-                st_age = start_age + i * 10.0
-                ed_age = st_age + 10.0
-                rows.append({
-                    "순서": i+1,
-                    "대운": sb,
-                    "시작(표기)": fmt_age_year_month(st_age),
-                    "끝(표기)": fmt_age_year_month(ed_age),
-                    "시작(세)": round(st_age, 2),
-                    "끝(세)": round(ed_age, 2),
-                })
-
             st.subheader("대운")
             if rows:
                 sel = st.selectbox(
@@ -900,17 +957,15 @@ if st.button("명식 계산"):
                     st.dataframe(rows, use_container_width=True, hide_index=True)
 
                 st.subheader("세운(선택 대운 10년)")
-                seun = build_10year_seun_table(rows[sel-1], solar_year)
+                seun = build_10year_seun_table(rows[sel-1], pillar_year, d_stem)
                 render_sewoon_scroll(seun)
 
                 with st.expander("세운 표(원본)", expanded=False):
                     st.dataframe(seun, use_container_width=True, hide_index=True)
-        except Exception as e:
-            st.warning(f"대운 계산은 실패했습니다: {e}")
 
 
         st.write("### 중간 값(검증용)")
-        st.write(f"- 좌표: lat={lat:.6f}, lon={lon:.6f}")
+        st.write(f"- 좌표: lat={lat_q:.6f}, lon={lon_q:.6f}")
         st.write(f"- 시간대(IANA): {tz_name}")
         st.write(f"- 입력 기준: {basis_note}")
         st.write(f"- 출생 시각(UTC): {utc_dt.isoformat()}")
@@ -924,13 +979,13 @@ if st.button("명식 계산"):
         st.write(f"- 균시차(EoT): {eot_min:+.3f} 분  (LAT = LMT + EoT)")
         st.write(f"- 진태양시(LAT): {lat_dt.replace(tzinfo=None).isoformat(sep=' ')} (표기상 UTC tz를 떼고 '현지 LAT'로 해석)")
         # term times
-        term_utc = utc_from_jd_ut(term_jd)
+        term_utc = c["term_utc"]
         st.write(f"- 월주 기준 절입시각(UTC): {term_utc.isoformat()}")
         try:
             st.write(f"- 월주 기준 절입시각(표준시): {term_utc.astimezone(ZoneInfo(tz_name)).isoformat()}")
         except Exception:
             pass
-        lichun_utc = utc_from_jd_ut(lichun_jd)
+        lichun_utc = c["lichun_utc"]
         st.write(f"- 입춘(연주 경계) 시각(UTC): {lichun_utc.isoformat()}")
 
     except Exception as e: